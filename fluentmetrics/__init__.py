@@ -2,4 +2,5 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from .buffer import BufferedFluentMetric  # noqa: F401
+from .catalog import MetricCatalog  # noqa: F401
 from .metric import FluentMetric  # noqa: F401
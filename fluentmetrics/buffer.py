@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging
+import threading
 
 from .metric import FluentMetric
 
@@ -20,28 +21,35 @@ class BufferedFluentMetric(FluentMetric):
     Occassionally, you may want to call metric.flush() manually (perhaps at the end of a
     web request or on a timer) to ensure that data is never older than a certain age.
 
-    This class is not thread safe.
+    A single instance can be shared between threads; use dimension_scope() to add
+    per-request dimensions instead of creating a BufferedFluentMetric per request.
+    Only dimensions are request-scoped: timers, the namespace and the storage
+    resolution are still shared, so concurrent requests must not use the same timer name.
     '''
 
     def __init__(self, client=None, max_items=PAGE_SIZE * 5, **kwargs):
         FluentMetric.__init__(self, client, **kwargs)
         self.max_items = max_items
         self.buffers = {}
+        self.lock = threading.Lock()
 
     def _record_metric(self, metric_data):
-        size = self._size()
+        with self.lock:
+            size = self._size()
 
-        num_allowed = self.max_items - size
-        if num_allowed < len(metric_data):
-            log.warn("Dropping {} out of {} metrics".format(len(metric_data) - num_allowed, len(metric_data)))
+            # pages put back after a failed send can leave the buffers over max_items
+            num_allowed = max(self.max_items - size, 0)
+            if num_allowed < len(metric_data):
+                log.warn("Dropping {} out of {} metrics".format(len(metric_data) - num_allowed, len(metric_data)))
 
-        buffer = self.buffers.get(self.namespace, [])
-        self.buffers[self.namespace] = buffer  # in case it wasn't set
+            buffer = self.buffers.get(self.namespace, [])
+            self.buffers[self.namespace] = buffer  # in case it wasn't set
 
-        buffer += metric_data[:num_allowed]
+            buffer += metric_data[:num_allowed]
 
-        # clear as much WIP as possible
-        self.flush(send_partial=False)
+            # clear as much WIP as possible
+            pages = self._take_pages(send_partial=False)
+        self._send(pages)
 
     def _size(self):
         return sum([len(buffer) for buffer in self.buffers.values()])
@@ -51,22 +59,29 @@ class BufferedFluentMetric(FluentMetric):
         this only sends full pages. This way, it minimizes the API usage at the cost of
         delaying data.
         '''
+        with self.lock:
+            pages = self._take_pages(send_partial)
+        self._send(pages)
+        return self
+
+    def _take_pages(self, send_partial):
+        # Called with the lock held. Removes the pages to be sent from the buffers so
+        # they can be shipped after the lock is released; other threads can keep
+        # buffering while put_metric_data is in flight. Each page keeps the namespace
+        # it was buffered under.
+        pages = []
         for namespace, buffer in self.buffers.items():
             full_pages = len(buffer) // PAGE_SIZE
             for i in range(full_pages):
                 start = i * PAGE_SIZE
                 end = (i + 1) * PAGE_SIZE
-                page = buffer[start:end]
-
-                # ship it
-                FluentMetric._record_metric(self, page)
+                pages.append((namespace, buffer[start:end]))
 
             start = full_pages * PAGE_SIZE
-            end = len(buffer) % PAGE_SIZE
             if send_partial:
                 # ship remaining items
-                page = buffer[start:end]
-                FluentMetric._record_metric(self, page)
+                if start < len(buffer):
+                    pages.append((namespace, buffer[start:]))
 
                 # clear buffer
                 self.buffers[namespace] = []
@@ -76,5 +91,20 @@ class BufferedFluentMetric(FluentMetric):
             elif full_pages > 0:
                 # clear shipped items from buffer
                 self.buffers[namespace] = buffer[start:]
+        return pages
 
-        return self
+    def _send(self, pages):
+        for i, (namespace, page) in enumerate(pages):
+            try:
+                # ship it
+                self._put_metric_data(namespace, page)
+            except BaseException:
+                self._restore(pages[i:])
+                raise
+
+    def _restore(self, pages):
+        # Puts unsent pages back at the front of their buffers, in order, so a failed
+        # send (e.g. throttling) doesn't lose them.
+        with self.lock:
+            for namespace, page in reversed(pages):
+                self.buffers[namespace] = page + self.buffers.get(namespace, [])
@@ -0,0 +1,259 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+log = logging.getLogger('metric')
+log.addHandler(logging.NullHandler())
+
+# CloudWatch only reports metrics with data points in this window when
+# RecentlyActive is set, and it is the only value the API accepts.
+RECENTLY_ACTIVE = 'PT3H'
+
+
+def _metric_key(metric):
+    dimensions = tuple(sorted((d['Name'], d['Value'])
+                              for d in metric.get('Dimensions', [])))
+    return (metric.get('Namespace'), metric.get('MetricName'), dimensions)
+
+
+def _copy_metric(metric):
+    # results are handed out as copies so callers can't corrupt the cache
+    copy = dict(metric)
+    copy['Dimensions'] = [dict(d) for d in metric.get('Dimensions', [])]
+    return copy
+
+
+def _filter_order(item):
+    # Value is optional in a filter; order None first instead of comparing it
+    name, value = item
+    return (name, value is not None, value or '')
+
+
+def _query_key(namespace, metric_name, dimensions):
+    filters = tuple(sorted(((d['Name'], d.get('Value'))
+                            for d in dimensions or []), key=_filter_order))
+    return (namespace, metric_name, filters)
+
+
+class _CatalogEntry(object):
+    '''The metrics returned by a single list_metrics query, indexed by
+    dimension name and by dimension name/value pair.
+    '''
+
+    def __init__(self, metrics, fetched_at):
+        self.fetched_at = fetched_at
+        self.metrics = OrderedDict()
+        self.by_name = {}
+        self.by_value = {}
+        self.merge(metrics)
+
+    def merge(self, metrics):
+        added = 0
+        for metric in metrics:
+            key = _metric_key(metric)
+            if key in self.metrics:
+                continue
+            self.metrics[key] = metric
+            added += 1
+            for d in metric.get('Dimensions', []):
+                self.by_name.setdefault(d['Name'], []).append(key)
+                self.by_value.setdefault((d['Name'], d['Value']), []).append(key)
+        return added
+
+    def all(self):
+        return [_copy_metric(m) for m in self.metrics.values()]
+
+    def find(self, name, value=None, metric_name=None):
+        if value is None:
+            keys = self.by_name.get(name, [])
+        else:
+            keys = self.by_value.get((name, value), [])
+        return [_copy_metric(self.metrics[k]) for k in keys
+                if metric_name is None or k[1] == metric_name]
+
+
+class MetricCatalog(object):
+    '''A cache over CloudWatch list_metrics.
+
+    Every query is fully paginated and the result is kept for Ttl seconds.
+    At most MaxEntries distinct queries are cached; the least recently used
+    one is evicted first. refresh() merges in metrics that were active in the
+    last three hours without re-listing everything and restarts the Ttl, so
+    calling it more often than every three hours keeps a query current
+    without paginating through it again. find() looks metrics up by
+    dimension without another API call. Concurrent misses on the same query
+    share a single listing. When several MetricNames miss the cache, they are
+    listed on a pool of MaxWorkers threads that is started on first use and
+    kept for the life of the catalog.
+
+    Results are copies; changing them does not affect the catalog.
+
+    The catalog is thread safe and can be shared between FluentMetric
+    instances with FluentMetric.with_catalog().
+    '''
+
+    def __init__(self, client, **kwargs):
+        self.client = client
+        self.ttl = kwargs.get('Ttl', 300)
+        self.max_entries = kwargs.get('MaxEntries', 128)
+        self.max_workers = kwargs.get('MaxWorkers', 4)
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_metrics(self, **kwargs):
+        '''Returns every metric matching Namespace, MetricName and
+        Dimensions (a list of {'Name': ..., 'Value': ...} filters; Value is
+        optional). Pass MetricNames instead of MetricName to list several
+        metric names concurrently; the results are concatenated.
+        '''
+        namespace = kwargs.get('Namespace')
+        dimensions = kwargs.get('Dimensions')
+        metric_names = kwargs.get('MetricNames')
+        if metric_names is None:
+            entry = self._get_entry(namespace, kwargs.get('MetricName'), dimensions)
+            with self.lock:
+                return entry.all()
+
+        def fetch(metric_name):
+            return self._get_entry(namespace, metric_name, dimensions)
+
+        with self.lock:
+            entries = [self._cached_entry(_query_key(namespace, mn, dimensions))
+                       for mn in metric_names]
+        misses = [mn for mn, entry in zip(metric_names, entries) if entry is None]
+        if self.max_workers > 1 and len(misses) > 1:
+            fetched = dict(zip(misses, self._get_executor().map(fetch, misses)))
+        else:
+            fetched = dict((mn, fetch(mn)) for mn in misses)
+
+        metrics = []
+        with self.lock:
+            for mn, entry in zip(metric_names, entries):
+                metrics += (entry or fetched[mn]).all()
+        return metrics
+
+    def find(self, **kwargs):
+        '''Returns the metrics in Namespace that carry the dimension
+        DimensionName (optionally with DimensionValue), optionally restricted
+        to MetricName. Lists the whole namespace once and serves later
+        lookups from the cached index.
+        '''
+        entry = self._get_entry(kwargs.get('Namespace'), None, None)
+        with self.lock:
+            return entry.find(kwargs.get('DimensionName'),
+                              kwargs.get('DimensionValue'),
+                              kwargs.get('MetricName'))
+
+    def refresh(self, **kwargs):
+        '''Adds metrics that were recently active to a cached query without
+        listing it in full again. Falls back to a full listing if the query
+        is not cached. Returns the number of metrics added.
+        '''
+        namespace = kwargs.get('Namespace')
+        metric_name = kwargs.get('MetricName')
+        dimensions = kwargs.get('Dimensions')
+        key = _query_key(namespace, metric_name, dimensions)
+        with self.lock:
+            entry = self._cached_entry(key)
+        if entry is not None:
+            fetched_at = time.monotonic()
+            metrics = self._list_metrics(namespace, metric_name, dimensions,
+                                         RecentlyActive=RECENTLY_ACTIVE)
+            with self.lock:
+                # the entry may have been evicted or invalidated meanwhile
+                if self.entries.get(key) is entry:
+                    entry.fetched_at = max(entry.fetched_at, fetched_at)
+                    return entry.merge(metrics)
+
+        entry = self._get_entry(namespace, metric_name, dimensions)
+        with self.lock:
+            return len(entry.metrics)
+
+    def invalidate(self, **kwargs):
+        '''Drops cached queries. With no arguments, drops everything;
+        otherwise only queries in Namespace are dropped.
+        '''
+        namespace = kwargs.get('Namespace')
+        with self.lock:
+            if namespace is None:
+                self.entries.clear()
+                return self
+            for key in [k for k in self.entries if k[0] == namespace]:
+                del self.entries[key]
+        return self
+
+    def _is_expired(self, entry):
+        return time.monotonic() - entry.fetched_at >= self.ttl
+
+    def _cached_entry(self, key):
+        # Called with the lock held.
+        entry = self.entries.get(key)
+        if entry is None or self._is_expired(entry):
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+
+    def _get_entry(self, namespace, metric_name, dimensions):
+        key = _query_key(namespace, metric_name, dimensions)
+        with self.lock:
+            entry = self._cached_entry(key)
+            if entry is not None:
+                return entry
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            fetched_at = time.monotonic()
+            entry = _CatalogEntry(
+                self._list_metrics(namespace, metric_name, dimensions), fetched_at)
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                log.debug('catalog: evicted {}'.format(evicted))
+        future.set_result(entry)
+        return entry
+
+    def _list_metrics(self, namespace, metric_name, dimensions, **kwargs):
+        params = dict(kwargs)
+        if namespace:
+            params['Namespace'] = namespace
+        if metric_name:
+            params['MetricName'] = metric_name
+        if dimensions:
+            params['Dimensions'] = dimensions
+
+        metrics = []
+        while True:
+            response = self.client.list_metrics(**params)
+            metrics += response.get('Metrics', [])
+            token = response.get('NextToken')
+            if not token:
+                return metrics
+            params['NextToken'] = token
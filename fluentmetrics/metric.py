@@ -7,6 +7,9 @@ import uuid
 import boto3
 import boto3.session
 
+from .catalog import MetricCatalog
+from .scope import DimensionScope, scoped_dimensions
+
 logger = logging.getLogger('metric')
 logger.addHandler(logging.NullHandler())
 
@@ -31,6 +34,7 @@ class FluentMetric(object):
         self.timers = {}
         self.dimension_stack = []
         self.storage_resolution = 60
+        self.catalog = None
         self.use_stream_id = kwargs.get('UseStreamId', True)
         if self.use_stream_id:
             self.stream_id = str(uuid.uuid4())
@@ -57,6 +61,10 @@ class FluentMetric(object):
         self.with_dimension('MetricStreamId', self.stream_id)
         return self
 
+    def with_catalog(self, catalog):
+        self.catalog = catalog
+        return self
+
     def with_namespace(self, namespace):
         self.namespace = namespace
         return self
@@ -67,26 +75,43 @@ class FluentMetric(object):
         return self
 
     def without_dimension(self, name):
-        if not self.does_dimension_exist(name):
+        if not self._has_own_dimension(name):
             return
         self.dimensions = \
             [item for item in self.dimensions if not item['Name'] == name]
         return self
 
+    def _has_own_dimension(self, name):
+        return any(item['Name'] == name for item in self.dimensions)
+
     def does_dimension_exist(self, name):
-        d = [item for item in self.dimensions if item['Name'] == name]
+        d = [item for item in self._current_dimensions() if item['Name'] == name]
         if d:
             return True
         else:
             return False
 
     def get_dimension_value(self, name):
-        d = [item for item in self.dimensions if item['Name'] == name]
+        d = [item for item in self._current_dimensions() if item['Name'] == name]
         if d:
             return d[0]['Value']
         else:
             return None
 
+    def dimension_scope(self):
+        '''Returns a context manager whose dimensions only apply to metrics
+        logged from the current thread or asyncio task while it is entered.
+        '''
+        return DimensionScope(self)
+
+    def _current_dimensions(self):
+        scoped = scoped_dimensions(self)
+        if not scoped:
+            return self.dimensions
+        names = scoped.names()
+        return [item for item in self.dimensions if item['Name'] not in names] + \
+            scoped.dimensions()
+
     def with_timer(self, timer):
         self.timers[timer] = Timer()
         return self
@@ -337,8 +362,9 @@ class FluentMetric(object):
                         .format('YYYY-MM-DD HH:mm:ss ZZ'))
         value = float(kwargs.get('Value'))
         unit = kwargs.get('Unit')
+        dimensions = self._current_dimensions()
         md = []
-        for dimension in self.dimensions:
+        for dimension in dimensions:
             md.append({
                 'MetricName': kwargs.get('MetricName'),
                 'Dimensions': [dimension],
@@ -351,7 +377,7 @@ class FluentMetric(object):
 
         md.append({
             'MetricName': kwargs.get('MetricName'),
-            'Dimensions': self.dimensions,
+            'Dimensions': dimensions,
             'Timestamp': ts,
             'Value': value,
             'Unit': unit,
@@ -362,14 +388,20 @@ class FluentMetric(object):
         return self
 
     def _record_metric(self, metric_data):
+        self._put_metric_data(self.namespace, metric_data)
+
+    def _put_metric_data(self, namespace, metric_data):
         logger.debug('log: {}'.format(metric_data))
         if metric_data:
             self.client.put_metric_data(
-                Namespace=self.namespace,
+                Namespace=namespace,
                 MetricData=metric_data,
             )
 
     def get_metrics(self, **kwargs):
-        mn = kwargs.get('MetricName')
-        return self.client.list_metrics(Namespace=self.namespace,
-                                        MetricName=mn)['Metrics']
+        if not self.catalog:
+            self.catalog = MetricCatalog(self.client)
+        return self.catalog.get_metrics(Namespace=self.namespace,
+                                        MetricName=kwargs.get('MetricName'),
+                                        MetricNames=kwargs.get('MetricNames'),
+                                        Dimensions=kwargs.get('Dimensions'))
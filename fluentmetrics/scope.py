@@ -0,0 +1,178 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+from collections import OrderedDict
+
+try:
+    import contextvars
+except ImportError:  # Python < 3.7
+    contextvars = None
+
+_REMOVED = object()
+
+
+class DimensionSet(object):
+    '''An immutable set of dimensions. Adding or removing a dimension returns
+    a new set that points back at this one, so it costs O(1) and never
+    disturbs anyone else holding the original.
+    '''
+    __slots__ = ('parent', 'name', 'value', '_resolved')
+
+    def __init__(self, parent=None, name=None, value=None):
+        self.parent = parent
+        self.name = name
+        self.value = value
+        self._resolved = None
+
+    def with_dimension(self, name, value):
+        return DimensionSet(self, name, value)
+
+    def without_dimension(self, name):
+        return DimensionSet(self, name, _REMOVED)
+
+    def _resolve(self):
+        # safe to cache, nothing about this set can change
+        if self._resolved is None:
+            chain = []
+            node = self
+            while node.parent is not None:
+                chain.append(node)
+                node = node.parent
+            values = OrderedDict()
+            for node in reversed(chain):
+                values.pop(node.name, None)
+                if node.value is not _REMOVED:
+                    values[node.name] = node.value
+            dimensions = [{'Name': k, 'Value': v} for k, v in values.items()]
+            names = frozenset(node.name for node in chain)
+            self._resolved = (dimensions, names)
+        return self._resolved
+
+    def dimensions(self):
+        return list(self._resolve()[0])
+
+    def names(self):
+        '''Names this set adds or removes, i.e. the ones it overrides.'''
+        return self._resolve()[1]
+
+    def __len__(self):
+        return len(self._resolve()[0])
+
+    def __bool__(self):
+        return self.parent is not None
+
+    __nonzero__ = __bool__
+
+
+EMPTY = DimensionSet()
+
+
+class _ThreadLocalVar(object):
+    '''Stand-in for ContextVar on Pythons without contextvars. Scopes are
+    isolated per thread, but not per asyncio task.
+    '''
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+        self.local = threading.local()
+
+    def get(self):
+        return getattr(self.local, 'value', self.default)
+
+    def set(self, value):
+        self.local.value = value
+
+
+# One var for every FluentMetric: contexts keep their vars alive, so a var
+# per instance would leak. It holds a dict from metric to the innermost
+# entered frame, a (scope, DimensionSet, parent frame) tuple. Neither is ever
+# modified in place, only replaced, so each thread or task sees its own stack.
+if contextvars:
+    _scopes = contextvars.ContextVar('fluentmetrics_dimensions', default=None)
+else:
+    _scopes = _ThreadLocalVar('fluentmetrics_dimensions', None)
+
+
+def _frame(metric):
+    scopes = _scopes.get()
+    if not scopes:
+        return None
+    return scopes.get(metric)
+
+
+def _set_frame(metric, frame):
+    scopes = dict(_scopes.get() or {})
+    if frame is None:
+        scopes.pop(metric, None)
+    else:
+        scopes[metric] = frame
+    _scopes.set(scopes)
+
+
+def scoped_dimensions(metric):
+    frame = _frame(metric)
+    if frame is None:
+        return EMPTY
+    return frame[1]
+
+
+class DimensionScope(object):
+    '''Adds dimensions to a FluentMetric for the current thread or asyncio
+    task only. The dimensions apply on top of the metric's own while the
+    scope is entered and are dropped when it exits; concurrent requests
+    sharing the same metric never see each other's scoped dimensions.
+    Timers are not scoped.
+
+        with m.dimension_scope().with_dimension('Route', '/users'):
+            m.count(MetricName='Requests')
+
+    A scope can be entered any number of times, including concurrently from
+    several threads or tasks. Changing a scope that is entered in the current
+    context only affects that entry, and is only allowed on the innermost
+    scope; changing it anywhere else affects every later entry.
+    '''
+
+    def __init__(self, metric):
+        self.metric = metric
+        self.pending = []
+
+    def with_dimension(self, name, value):
+        return self._apply(lambda dimensions: dimensions.with_dimension(name, value))
+
+    def without_dimension(self, name):
+        return self._apply(lambda dimensions: dimensions.without_dimension(name))
+
+    def _is_entered(self):
+        frame = _frame(self.metric)
+        while frame is not None:
+            if frame[0] is self:
+                return True
+            frame = frame[2]
+        return False
+
+    def _apply(self, change):
+        if not self._is_entered():
+            self.pending.append(change)
+            return self
+        scope, dimensions, parent = _frame(self.metric)
+        if scope is not self:
+            raise ValueError('Only the innermost entered scope can be changed')
+        _set_frame(self.metric, (self, change(dimensions), parent))
+        return self
+
+    def __enter__(self):
+        parent = _frame(self.metric)
+        dimensions = scoped_dimensions(self.metric)
+        for change in self.pending:
+            dimensions = change(dimensions)
+        _set_frame(self.metric, (self, dimensions, parent))
+        return self
+
+    def __exit__(self, *exc):
+        frame = _frame(self.metric)
+        if frame is None or frame[0] is not self:
+            raise ValueError('Scope exited out of order')
+        _set_frame(self.metric, frame[2])
+        return False
@@ -1,5 +1,6 @@
 import logging
 import mock
+import threading
 import unittest
 from moto import mock_cloudwatch
 from fluentmetrics import BufferedFluentMetric
@@ -84,6 +85,80 @@ class TestBuffer(unittest.TestCase):
             values = [d['Value'] for d in data if d['MetricName'] == 'counter']
             self.assertSequenceEqual(values, [1, 1, 1])
 
+    @with_metric()
+    def test_shared_between_threads(self, m, cw):
+        def request(n):
+            with m.dimension_scope().with_dimension('Request', n):
+                for i in range(10):
+                    m.count(MetricName='counter', Value=1)
+
+        threads = [threading.Thread(target=request, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        m.flush()
+
+        data = [d for call in cw.calls for d in call['MetricData']]
+        # each count sends the single dimension and the combined set
+        assert len(data) == 4 * 10 * 2
+        for n in range(4):
+            combined = [d for d in data if d['Dimensions'] == [{'Name': 'Request', 'Value': n}]]
+            assert len(combined) == 20
+
+    @with_metric()
+    def test_sends_outside_lock(self, m, cw):
+        locked = []
+        put_metric_data = cw.put_metric_data
+
+        def check_lock(**kwargs):
+            locked.append(m.lock.locked())
+            put_metric_data(**kwargs)
+
+        cw.put_metric_data = check_lock
+        for i in range(4):
+            m.count(MetricName='counter', Value=i)
+        m.flush()
+        assert locked == [False, False]
+
+    @with_metric()
+    def test_flush_sends_full_and_partial_pages(self, m, cw):
+        m.max_items = 20
+        m.buffers['namespace'] = [{'Value': i} for i in range(7)]
+        m.flush()
+        self.assertSequenceEqual([len(c['MetricData']) for c in cw.calls], [3, 3, 1])
+        assert m.buffers['namespace'] == []
+
+    @with_metric()
+    def test_failed_send_keeps_unsent_pages(self, m, cw):
+        m.buffers['namespace'] = [{'Value': i} for i in range(7)]
+        put_metric_data = cw.put_metric_data
+
+        def fail_second_page(**kwargs):
+            if cw.calls:
+                raise RuntimeError('Throttling')
+            put_metric_data(**kwargs)
+
+        cw.put_metric_data = fail_second_page
+        with self.assertRaises(RuntimeError):
+            m.flush()
+        assert len(cw.calls) == 1
+        self.assertSequenceEqual([d['Value'] for d in m.buffers['namespace']], [3, 4, 5, 6])
+
+        cw.put_metric_data = put_metric_data
+        m.flush()
+        values = [d['Value'] for c in cw.calls for d in c['MetricData']]
+        self.assertSequenceEqual(values, list(range(7)))
+
+    @with_metric()
+    def test_pages_keep_their_namespace(self, m, cw):
+        m.count(MetricName='counter', Value=1)
+        m.with_namespace('other')
+        m.count(MetricName='counter', Value=2)
+        m.flush()
+        namespaces = dict((c['MetricData'][0]['Value'], c['Namespace']) for c in cw.calls)
+        assert namespaces == {1: 'namespace', 2: 'other'}
+
 
 class Dummy(object):
     def __init__(self):
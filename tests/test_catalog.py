@@ -0,0 +1,237 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import boto3
+import mock
+import threading
+import unittest
+from moto import mock_cloudwatch
+from fluentmetrics import FluentMetric, MetricCatalog
+
+
+def metric(name, **dimensions):
+    return {
+        'Namespace': 'namespace',
+        'MetricName': name,
+        'Dimensions': [{'Name': k, 'Value': v} for k, v in sorted(dimensions.items())],
+    }
+
+
+class TestCatalog(unittest.TestCase):
+    def test_paginates_list_metrics(self):
+        cw = Dummy([metric('m{}'.format(i)) for i in range(7)], page_size=3)
+        catalog = MetricCatalog(cw)
+        metrics = catalog.get_metrics(Namespace='namespace')
+        assert len(metrics) == 7
+        assert len(cw.calls) == 3
+
+    def test_caches_results(self):
+        cw = Dummy([metric('m1'), metric('m2')])
+        catalog = MetricCatalog(cw)
+        catalog.get_metrics(Namespace='namespace')
+        catalog.get_metrics(Namespace='namespace')
+        assert len(cw.calls) == 1
+
+    @mock.patch('fluentmetrics.catalog.time.monotonic')
+    def test_expires_after_ttl(self, monotonic):
+        monotonic.return_value = 100
+        cw = Dummy([metric('m1')])
+        catalog = MetricCatalog(cw, Ttl=10)
+        catalog.get_metrics(Namespace='namespace')
+        monotonic.return_value = 109
+        catalog.get_metrics(Namespace='namespace')
+        assert len(cw.calls) == 1
+        monotonic.return_value = 110
+        catalog.get_metrics(Namespace='namespace')
+        assert len(cw.calls) == 2
+
+    def test_evicts_least_recently_used(self):
+        cw = Dummy([metric('m1'), metric('m2'), metric('m3')])
+        catalog = MetricCatalog(cw, MaxEntries=2)
+        catalog.get_metrics(Namespace='namespace', MetricName='m1')
+        catalog.get_metrics(Namespace='namespace', MetricName='m2')
+        catalog.get_metrics(Namespace='namespace', MetricName='m1')
+        catalog.get_metrics(Namespace='namespace', MetricName='m3')
+        assert len(catalog.entries) == 2
+        assert len(cw.calls) == 3
+
+        catalog.get_metrics(Namespace='namespace', MetricName='m1')
+        assert len(cw.calls) == 3
+        catalog.get_metrics(Namespace='namespace', MetricName='m2')
+        assert len(cw.calls) == 4
+
+    def test_lists_metric_names_in_parallel(self):
+        cw = Dummy([metric('m1'), metric('m2'), metric('m3')])
+        catalog = MetricCatalog(cw, MaxWorkers=3)
+        metrics = catalog.get_metrics(Namespace='namespace', MetricNames=['m1', 'm3'])
+        self.assertSequenceEqual([m['MetricName'] for m in metrics], ['m1', 'm3'])
+        assert len(cw.calls) == 2
+
+    @mock.patch('fluentmetrics.catalog.ThreadPoolExecutor')
+    def test_metric_names_only_fetches_misses(self, executor):
+        executor.return_value.map.side_effect = map
+        cw = Dummy([metric('m1'), metric('m2'), metric('m3')])
+        catalog = MetricCatalog(cw, MaxWorkers=3)
+        catalog.get_metrics(Namespace='namespace', MetricName='m1')
+        catalog.get_metrics(Namespace='namespace', MetricNames=['m1', 'm2'])
+        assert not executor.called
+        metrics = catalog.get_metrics(Namespace='namespace', MetricNames=['m1', 'm2', 'm3'])
+        self.assertSequenceEqual([m['MetricName'] for m in metrics], ['m1', 'm2', 'm3'])
+        assert len(cw.calls) == 3
+
+        catalog.invalidate()
+        catalog.get_metrics(Namespace='namespace', MetricNames=['m1', 'm2'])
+        catalog.invalidate()
+        catalog.get_metrics(Namespace='namespace', MetricNames=['m1', 'm2'])
+        assert executor.call_count == 1
+        assert executor.return_value.map.call_count == 2
+
+    def test_optional_filter_values(self):
+        cw = Dummy([metric('m1', os='linux')])
+        catalog = MetricCatalog(cw)
+        dimensions = [{'Name': 'os', 'Value': 'linux'}, {'Name': 'os'}]
+        assert len(catalog.get_metrics(Namespace='namespace', Dimensions=dimensions)) == 1
+        assert len(catalog.get_metrics(Namespace='namespace', Dimensions=dimensions[::-1])) == 1
+        assert len(cw.calls) == 1
+
+    def test_interrupted_listing_is_not_left_in_flight(self):
+        cw = Dummy([metric('m1')])
+        list_metrics = cw.list_metrics
+        cw.list_metrics = mock.Mock(side_effect=KeyboardInterrupt)
+        catalog = MetricCatalog(cw)
+        with self.assertRaises(KeyboardInterrupt):
+            catalog.get_metrics(Namespace='namespace')
+        assert catalog.in_flight == {}
+
+        cw.list_metrics = list_metrics
+        assert len(catalog.get_metrics(Namespace='namespace')) == 1
+
+    def test_refresh_of_dropped_entry_lists_in_full(self):
+        cw = Dummy([metric('m1')])
+        catalog = MetricCatalog(cw)
+        catalog.get_metrics(Namespace='namespace')
+        list_metrics = cw.list_metrics
+
+        def invalidating_list_metrics(**kwargs):
+            catalog.invalidate()
+            cw.metrics.append(metric('m2'))
+            cw.list_metrics = list_metrics
+            return list_metrics(**kwargs)
+
+        cw.list_metrics = invalidating_list_metrics
+        assert catalog.refresh(Namespace='namespace') == 2
+        assert 'RecentlyActive' not in cw.calls[-1]
+        assert len(catalog.get_metrics(Namespace='namespace')) == 2
+        assert len(cw.calls) == 3
+
+    def test_refresh_merges_recently_active(self):
+        cw = Dummy([metric('m1', os='linux')])
+        catalog = MetricCatalog(cw)
+        catalog.get_metrics(Namespace='namespace')
+
+        cw.metrics.append(metric('m2', os='linux'))
+        assert catalog.refresh(Namespace='namespace') == 1
+        assert cw.calls[-1]['RecentlyActive'] == 'PT3H'
+        assert len(catalog.get_metrics(Namespace='namespace')) == 2
+        assert len(catalog.find(Namespace='namespace', DimensionName='os')) == 2
+        assert len(cw.calls) == 2
+
+    @mock.patch('fluentmetrics.catalog.time.monotonic')
+    def test_refresh_restarts_ttl(self, monotonic):
+        monotonic.return_value = 100
+        cw = Dummy([metric('m1')])
+        catalog = MetricCatalog(cw, Ttl=10)
+        catalog.get_metrics(Namespace='namespace')
+        monotonic.return_value = 105
+        catalog.refresh(Namespace='namespace')
+        monotonic.return_value = 110
+        catalog.get_metrics(Namespace='namespace')
+        assert len(cw.calls) == 2
+        assert 'RecentlyActive' in cw.calls[-1]
+        monotonic.return_value = 115
+        catalog.get_metrics(Namespace='namespace')
+        assert len(cw.calls) == 3
+        assert 'RecentlyActive' not in cw.calls[-1]
+
+    def test_concurrent_misses_share_one_listing(self):
+        cw = Dummy([metric('m1')])
+        listing = threading.Event()
+        release = threading.Event()
+        list_metrics = cw.list_metrics
+
+        def slow_list_metrics(**kwargs):
+            listing.set()
+            release.wait()
+            return list_metrics(**kwargs)
+
+        cw.list_metrics = slow_list_metrics
+        catalog = MetricCatalog(cw)
+        results = []
+
+        def get():
+            results.append(catalog.get_metrics(Namespace='namespace'))
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        threads[0].start()
+        listing.wait()
+        for t in threads[1:]:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+        assert len(cw.calls) == 1
+        assert len(results) == 4
+        assert all(len(r) == 1 for r in results)
+
+    def test_results_are_copies(self):
+        cw = Dummy([metric('m1', os='linux')])
+        catalog = MetricCatalog(cw)
+        catalog.get_metrics(Namespace='namespace')[0]['Dimensions'].append({'Name': 'host', 'Value': 'a'})
+        catalog.find(Namespace='namespace', DimensionName='os')[0]['Dimensions'][0]['Value'] = 'windows'
+        metrics = catalog.get_metrics(Namespace='namespace')
+        assert metrics[0]['Dimensions'] == [{'Name': 'os', 'Value': 'linux'}]
+        assert len(catalog.find(Namespace='namespace', DimensionName='os', DimensionValue='linux')) == 1
+
+    def test_find_by_dimension(self):
+        cw = Dummy([
+            metric('m1', os='linux'),
+            metric('m1', os='windows'),
+            metric('m2', os='linux', host='a'),
+            metric('m2'),
+        ])
+        catalog = MetricCatalog(cw)
+        assert len(catalog.find(Namespace='namespace', DimensionName='os')) == 3
+        assert len(catalog.find(Namespace='namespace', DimensionName='os', DimensionValue='linux')) == 2
+        assert len(catalog.find(Namespace='namespace', DimensionName='os', DimensionValue='linux', MetricName='m2')) == 1
+        assert len(catalog.find(Namespace='namespace', DimensionName='host', DimensionValue='b')) == 0
+        assert len(cw.calls) == 1
+
+
+@mock_cloudwatch
+def test_get_metrics_uses_catalog():
+    m = FluentMetric(client=boto3.client('cloudwatch', region_name='us-east-1'))
+    m.with_namespace('Performance').with_dimension('os', 'linux')
+    m.count(MetricName='test', Value=1)
+
+    metrics = m.get_metrics(MetricName='test')
+    assert len(metrics) == 3
+    linux = m.catalog.find(Namespace='Performance', DimensionName='os', DimensionValue='linux')
+    assert len(linux) == 2
+
+
+class Dummy(object):
+    def __init__(self, metrics, page_size=500):
+        self.metrics = metrics
+        self.page_size = page_size
+        self.calls = []
+
+    def list_metrics(self, **kwargs):
+        self.calls.append(kwargs)
+        matches = [m for m in self.metrics
+                   if 'MetricName' not in kwargs or m['MetricName'] == kwargs['MetricName']]
+        start = int(kwargs.get('NextToken', 0))
+        end = start + self.page_size
+        response = {'Metrics': matches[start:end]}
+        if end < len(matches):
+            response['NextToken'] = str(end)
+        return response
@@ -3,6 +3,10 @@
 
 
 import arrow
+import asyncio
+import pytest
+import sys
+import threading
 import time
 from fluentmetrics import FluentMetric
 import mock
@@ -115,3 +119,149 @@ def test_can_disable_stream_id():
     m = FluentMetric(UseStreamId=False).with_namespace('Performance')
     assert len(m.dimensions) == 0
 
+
+def test_dimension_scope_adds_dimensions_until_exit():
+    m = FluentMetric(UseStreamId=False).with_dimension('os', 'linux')
+    with m.dimension_scope().with_dimension('Route', '/users'):
+        assert m.get_dimension_value('Route') == '/users'
+        assert m.get_dimension_value('os') == 'linux'
+        assert len(m.dimensions) == 1
+    assert not m.does_dimension_exist('Route')
+
+
+def test_dimension_scope_overrides_and_removes_dimensions():
+    m = FluentMetric(UseStreamId=False).with_dimension('os', 'linux').with_dimension('host', 'a')
+    with m.dimension_scope().with_dimension('os', 'windows').without_dimension('host'):
+        assert m.get_dimension_value('os') == 'windows'
+        assert not m.does_dimension_exist('host')
+        with m.dimension_scope() as scope:
+            scope.with_dimension('host', 'b')
+            assert m.get_dimension_value('host') == 'b'
+        assert not m.does_dimension_exist('host')
+    assert m.get_dimension_value('os') == 'linux'
+    assert m.get_dimension_value('host') == 'a'
+
+
+@mock.patch('fluentmetrics.FluentMetric._record_metric')
+def test_log_includes_scoped_dimensions(record):
+    m = FluentMetric(UseStreamId=False).with_namespace('Performance').with_dimension('os', 'linux')
+    with m.dimension_scope().with_dimension('Route', '/users'):
+        m.count(MetricName='test')
+    md = record.call_args[0][0]
+    assert len(md) == 3
+    assert md[-1]['Dimensions'] == [{'Name': 'os', 'Value': 'linux'},
+                                    {'Name': 'Route', 'Value': '/users'}]
+
+
+def test_dimension_scope_is_isolated_between_threads():
+    m = FluentMetric(UseStreamId=False)
+    entered = threading.Event()
+    done = threading.Event()
+    seen = []
+
+    def request():
+        with m.dimension_scope().with_dimension('Route', '/users'):
+            entered.set()
+            done.wait()
+            seen.append(m.get_dimension_value('Route'))
+
+    t = threading.Thread(target=request)
+    t.start()
+    entered.wait()
+    assert not m.does_dimension_exist('Route')
+    done.set()
+    t.join()
+    assert seen == ['/users']
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='requires contextvars')
+def test_dimension_scope_is_isolated_between_tasks():
+    m = FluentMetric(UseStreamId=False)
+
+    async def request(route):
+        with m.dimension_scope().with_dimension('Route', route):
+            await asyncio.sleep(0)
+            return m.get_dimension_value('Route')
+
+    async def main():
+        return await asyncio.gather(request('/a'), request('/b'))
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(main()) == ['/a', '/b']
+    finally:
+        loop.close()
+
+
+def test_own_dimensions_can_change_inside_scope():
+    m = FluentMetric().with_stream_id('abc').with_dimension('os', 'linux')
+    with m.dimension_scope().without_dimension('os').without_dimension('MetricStreamId'):
+        m.with_dimension('os', 'windows')
+        assert [d for d in m.dimensions if d['Name'] == 'os'] == [{'Name': 'os', 'Value': 'windows'}]
+        m.with_stream_id('def')
+        assert [d for d in m.dimensions if d['Name'] == 'MetricStreamId'] == [{'Name': 'MetricStreamId', 'Value': 'def'}]
+        assert not m.does_dimension_exist('os')
+        m.without_dimension('os')
+    assert not m.does_dimension_exist('os')
+    assert m.get_dimension_value('MetricStreamId') == 'def'
+
+
+def test_dimension_scope_can_be_reentered():
+    m = FluentMetric(UseStreamId=False)
+    scope = m.dimension_scope().with_dimension('Route', '/users')
+    with scope:
+        with scope:
+            assert m.get_dimension_value('Route') == '/users'
+        assert m.get_dimension_value('Route') == '/users'
+    assert not m.does_dimension_exist('Route')
+
+
+def test_dimension_scope_is_per_metric():
+    m1 = FluentMetric(UseStreamId=False)
+    m2 = FluentMetric(UseStreamId=False)
+    with m1.dimension_scope().with_dimension('Route', '/users'):
+        with m2.dimension_scope().with_dimension('Route', '/orders'):
+            assert m1.get_dimension_value('Route') == '/users'
+            assert m2.get_dimension_value('Route') == '/orders'
+        assert not m2.does_dimension_exist('Route')
+
+
+def test_shared_scope_is_isolated_between_threads():
+    m = FluentMetric(UseStreamId=False)
+    scope = m.dimension_scope().with_dimension('Service', 'x')
+    barrier = threading.Barrier(2)
+    seen = {}
+    errors = []
+
+    def request(route):
+        try:
+            with scope:
+                scope.with_dimension('Route', route)
+                barrier.wait()
+                seen[route] = (m.get_dimension_value('Service'), m.get_dimension_value('Route'))
+                barrier.wait()
+            seen[route] += (m.does_dimension_exist('Service'),)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request, args=(r,)) for r in ('/a', '/b')]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert seen == {'/a': ('x', '/a', False), '/b': ('x', '/b', False)}
+
+
+def test_only_innermost_scope_can_change():
+    m = FluentMetric(UseStreamId=False)
+    with m.dimension_scope() as outer:
+        with m.dimension_scope() as inner:
+            with pytest.raises(ValueError):
+                outer.with_dimension('a', '1')
+            inner.with_dimension('b', '2')
+            assert m.get_dimension_value('b') == '2'
+        assert not m.does_dimension_exist('b')
+        outer.with_dimension('a', '1')
+        assert m.get_dimension_value('a') == '1'
+    assert not m.does_dimension_exist('a')